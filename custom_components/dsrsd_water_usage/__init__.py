@@ -1,5 +1,14 @@
-from .sensor import DSRSDWaterUsage
+import asyncio
+import logging
+import aiohttp
+
 from .const import DOMAIN
+from .coordinator import DSRSDUsageCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Logout on unload is best effort and must not hold up the unload
+LOGOUT_TIMEOUT = 10
 
 async def async_setup(hass, config):
     """Set up the DSRSD Water Usage component."""
@@ -7,12 +16,22 @@ async def async_setup(hass, config):
 
 async def async_setup_entry(hass, config_entry):
     """Set up DSRSD Water Usage from a config entry."""
-    hass.async_create_task(
-        hass.config_entries.async_forward_entry_setups(config_entry, "sensor")
-    )
+    coordinator = DSRSDUsageCoordinator(hass, config_entry)
+    await coordinator.async_config_entry_first_refresh()
+    hass.data.setdefault(DOMAIN, {})[config_entry.entry_id] = coordinator
+
+    await hass.config_entries.async_forward_entry_setups(config_entry, ["sensor"])
     return True
 
 async def async_unload_entry(hass, config_entry):
     """Unload a config entry."""
-    await hass.config_entries.async_forward_entry_unload(config_entry, "sensor")
-    return True
+    unload_ok = await hass.config_entries.async_forward_entry_unload(config_entry, "sensor")
+    if unload_ok:
+        coordinator = hass.data[DOMAIN].pop(config_entry.entry_id)
+        # End the portal session now that nothing polls it
+        try:
+            async with asyncio.timeout(LOGOUT_TIMEOUT):
+                await coordinator.logout()
+        except (aiohttp.ClientError, TimeoutError) as e:
+            _LOGGER.warning("Error logging out: %s", e)
+    return unload_ok
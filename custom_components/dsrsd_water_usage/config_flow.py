@@ -3,6 +3,11 @@ from homeassistant import config_entries
 
 from .const import DOMAIN
 
+STEP_USER_DATA_SCHEMA = vol.Schema({
+    vol.Required("username", description={"suggested_value": ""}): str,
+    vol.Required("password", description={"suggested_value": ""}): str,
+})
+
 class DsrsdWaterUsageConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for DSRSD Water Usage."""
 
@@ -14,14 +19,9 @@ class DsrsdWaterUsageConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             # Validate user input here and process the configuration
             return self.async_create_entry(title="DSRSD Water Usage", data=user_input)
 
-        data_schema = vol.Schema({
-            vol.Required("username", description={"suggested_value": ""}): str,
-            vol.Required("password", description={"suggested_value": ""}): str,
-        })
-
         return self.async_show_form(
             step_id="user", 
-            data_schema=data_schema, 
+            data_schema=STEP_USER_DATA_SCHEMA, 
             errors=errors,
             description_placeholders={
                 "description": "Enter your DSRSD credentials to connect"
@@ -1,2 +1,3 @@
 """Constants for the DSRSD Water Usage integration."""
 DOMAIN = "dsrsd_water_usage"
+CONF_ACCOUNT_NUMBER = "account_number"
@@ -0,0 +1,359 @@
+"""Data update coordinator for the DSRSD Water Usage integration."""
+import logging
+import aiohttp
+import ijson
+from datetime import datetime, timedelta
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics, get_last_statistics
+from homeassistant.const import UnitOfVolume
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+from homeassistant.util.json import JSON_DECODE_EXCEPTIONS, json_loads
+from zoneinfo import ZoneInfo
+
+from .const import CONF_ACCOUNT_NUMBER, DOMAIN
+
+# Set the scan interval to 3 hours
+SCAN_INTERVAL = timedelta(hours=3)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Constants
+BASE_URL = "https://dsrsd.aquahawk.us"
+DEFAULT_API_PREFIX = BASE_URL + "/"
+USAGES_API_PREFIX = BASE_URL + "/"
+API_HEADERS = {
+    'Content-Type': 'application/json',
+    'Accept': "application/json",
+}
+# The portal reports and expects times in the district's local time zone
+PORTAL_TIME_ZONE = ZoneInfo("America/Los_Angeles")
+# Query parameters that are the same on every timeseries request
+TIMESERIES_PARAMS = {
+    "interval": "1 day",
+    "districtName": "dsrsd",
+    # Boundary samples outside the window are not imported
+    "extraStartTime": "false",
+    "extraEndTime": "false",
+    # Sent as a repeated "metrics" key, one per requested metric;
+    # only waterUseActual is read from the response.
+    "metrics": ("waterUse",),
+}
+# Statuses the portal returns once the connect.sid session has expired
+AUTH_FAILED_STATUSES = (401, 403)
+
+class DSRSDUsageCoordinator(DataUpdateCoordinator):
+    """Fetch DSRSD water usage once per interval for all entities of an entry."""
+
+    def __init__(self, hass, config_entry):
+        """Initialize the coordinator."""
+        super().__init__(
+            hass, _LOGGER, config_entry=config_entry, name=DOMAIN, update_interval=SCAN_INTERVAL
+        )
+        self.username = config_entry.data["username"]
+        self.password = config_entry.data["password"]
+        # Dedicated session so the login cookie stays private to this
+        # integration while still sharing Home Assistant's connection pool.
+        self._session = async_create_clientsession(hass)
+        # Bound on the first successful poll and kept on the config entry
+        self.account_number = config_entry.data.get(CONF_ACCOUNT_NUMBER)
+        self.billing_details = {}
+        self.dates = []
+        self.time_series_data = []  # List to store time series data
+        self.usage_sum = 0  # Running sum of the imported statistics
+        self._accounts_cache = None
+        self._logged_in = False
+
+    async def _async_update_data(self):
+        """Fetch new usage, import it into statistics and return the combined data."""
+        _LOGGER.debug("Getting Time Series Data")
+        try:
+            new_data, previous_sum = await self.get_water_usage(7)  # Fetch data for 7 days
+        except UpdateFailed:
+            # The session may have expired in a way we could not detect,
+            # so log in again on the next poll.
+            self._logged_in = False
+            raise
+        if new_data:
+            self.update_statistics(new_data, previous_sum)
+
+        _LOGGER.debug("Get current billing details: %s", self.billing_details)
+        return {
+            "time_series": self.time_series_data,
+            # Total of the imported statistic, so it survives restarts
+            "total_gallons": self.usage_sum,
+            "billing_details": self.billing_details,
+            "start_date": self.dates[0],
+            "end_date": self.dates[-1],
+        }
+
+    async def get_water_usage(self, num_days=7):
+        """Fetch and combine water usage data for a specified number of past days."""
+        self._accounts_cache = None
+        # The session is kept between polls; requests log in again if it expired.
+        if not self._logged_in:
+            login_success = await self.login()
+
+            if not login_success:
+                raise UpdateFailed("Failed to log in for water usage data")
+
+        if not self.account_number:
+            self.account_number = await self.bind_multi_meter()
+            if self.account_number:
+                self.hass.config_entries.async_update_entry(
+                    self.config_entry,
+                    data={**self.config_entry.data, CONF_ACCOUNT_NUMBER: self.account_number},
+                )
+        self.billing_details = await self.get_billing_data()
+        if not self.account_number:
+            raise UpdateFailed("Failed to bind meter for water usage data")
+        all_records = []
+        today = datetime.today()
+        localized_end_datetime = today.replace(tzinfo=PORTAL_TIME_ZONE,microsecond=0)
+        end_iso_format = localized_end_datetime.isoformat()
+
+        start = today - timedelta(days=num_days)
+        localized_start_datetime = start.replace(tzinfo=PORTAL_TIME_ZONE,microsecond=0)
+
+        # Only ask for what the recorder doesn't have yet. The newest bucket
+        # is fetched again since it is usually partial when first imported.
+        last_start, previous_sum, self.usage_sum = await self.get_last_statistic()
+        if last_start:
+            fetch_start = last_start.astimezone(PORTAL_TIME_ZONE)
+            if not self.time_series_data:
+                # Refill the time_series attribute window after a restart
+                fetch_start = min(fetch_start, localized_start_datetime)
+        else:
+            fetch_start = localized_start_datetime
+        start_iso_format = fetch_start.isoformat()
+
+        now = datetime.now()
+        self.dates = [(now - timedelta(days=day)).strftime("%B %d, %Y") for day in range(num_days, 0, -1)]
+        _LOGGER.debug("Getting load usage")
+        records = await self.call_load_water_usage_api(start_iso_format, end_iso_format, self.account_number)
+        if records is not None:
+            time_zone = dt_util.DEFAULT_TIME_ZONE
+            for usage_date_str, usage_value in records:
+                _LOGGER.debug("get usage based on time")
+                #sometimes these values are NoneType?
+                if usage_date_str is None or usage_value is None:
+                    _LOGGER.error("Error getting water usage data record specifics: startTime=%s, gallons=%s", usage_date_str, usage_value)
+                    continue
+                # datetime_str = f"{usage_date_str}"
+                # datetime_obj = datetime.strptime(datetime_str, "%B %d, %Y %I:%M %p")
+                # datetime_iso_str = datetime_obj.isoformat()
+                usage_date = datetime.fromisoformat(usage_date_str)
+                # Naive times would otherwise be read as the host's time zone
+                if usage_date.tzinfo is None:
+                    usage_date = usage_date.replace(tzinfo=time_zone)
+                else:
+                    usage_date = usage_date.astimezone(time_zone)
+                _LOGGER.debug("append usage based on time")
+                all_records.append((usage_date, usage_value))
+        else:
+            raise UpdateFailed(f"Failed to fetch water usage data since {start_iso_format}")
+
+        # Keep the last num_days of usage for the time_series attribute,
+        # letting refetched buckets replace their earlier values.
+        time_series = dict(self.time_series_data)
+        time_series.update(all_records)
+        self.time_series_data = sorted(
+            (timestamp, usage) for timestamp, usage in time_series.items()
+            if timestamp >= localized_start_datetime
+        )
+
+        if last_start:
+            # Everything before the newest bucket is already imported
+            all_records = [record for record in all_records if record[0] >= last_start]
+            if not all_records or all_records[0][0] != last_start:
+                # The newest bucket wasn't returned, so it keeps its stored
+                # value and the new buckets continue from its sum.
+                return all_records, self.usage_sum
+        return all_records, previous_sum
+
+    @property
+    def statistic_id(self):
+        return f"{DOMAIN}:{self.account_number}_usage"
+
+    async def get_last_statistic(self):
+        """Return the start of the newest imported statistic, the sum before it and its sum."""
+        last_stats = await get_instance(self.hass).async_add_executor_job(
+            get_last_statistics, self.hass, 1, self.statistic_id, True, {"sum", "state"}
+        )
+        if not last_stats.get(self.statistic_id):
+            return None, 0, 0
+        last_stat = last_stats[self.statistic_id][0]
+        last_sum = last_stat["sum"] or 0
+        previous_sum = last_sum - (last_stat["state"] or 0)
+        return dt_util.utc_from_timestamp(last_stat["start"]), previous_sum, last_sum
+
+    def update_statistics(self, new_data: list[tuple[datetime, float]], usage_sum=0):
+        stats_meta = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name="DSRSD Water Usage",
+            source=DOMAIN,
+            statistic_id=self.statistic_id,
+            unit_of_measurement=UnitOfVolume.GALLONS,
+        )
+
+        stats_data = []
+        for timestamp, usage in new_data:
+            usage_sum += usage
+            stats_data.append(StatisticData(start=timestamp, state=usage, sum=usage_sum))
+        self.usage_sum = usage_sum
+
+        async_add_external_statistics(self.hass, stats_meta, stats_data)
+
+    async def login(self):
+        async with self._session.get(BASE_URL, headers=API_HEADERS):
+            pass
+        login_url = DEFAULT_API_PREFIX + "login"
+        data = {
+            "username": self.username,
+            "password": self.password,
+        }
+
+        _LOGGER.debug("Sending login POST request")
+        login_response_json = await self.make_api_request(login_url, data)
+        if login_response_json:
+            login_success = login_response_json.get('response') == 200
+            _LOGGER.info("Login %s", "succeeded" if login_success else "failed")
+            self._logged_in = login_success
+            return login_success
+        _LOGGER.warning("Login failed: No response data")
+        self._logged_in = False
+        return False
+
+    async def logout(self):
+        self._logged_in = False
+        async with self._session.get(DEFAULT_API_PREFIX + 'logout', headers=API_HEADERS) as response:
+            # Check if the logout was successful (optional)
+            if response.status == 200:
+                _LOGGER.debug("Logout successful")
+            else:
+                _LOGGER.warning("Logout failed. Status code: %s", response.status)
+
+    async def _fetch_accounts(self):
+        """Return the accounts response, fetching it at most once per poll."""
+        if self._accounts_cache is None:
+            api_url = USAGES_API_PREFIX + "accounts"
+            self._accounts_cache = await self.make_get_api_request(api_url, {}, True)
+        return self._accounts_cache
+
+    async def bind_multi_meter(self):
+        response_json = await self._fetch_accounts()
+        if response_json:
+            meters = response_json.get("accounts", [{}])
+            # Iterate until we find a meter where 'Advanced Meter Infrastructure' == TRUE
+            for meter in meters:
+                if meter.get("IsAMI"):
+                    return meter.get("_id", "")
+            # Otherwise, return the first meter
+            return meters[0].get("_id", "")
+            
+
+        _LOGGER.warning("Meter details failed: No response data")
+        return None
+
+    async def get_billing_data(self):
+        response_json = await self._fetch_accounts()
+        if response_json:
+            attributes = response_json.get("accounts", [])
+            for attribute in attributes:
+                if attribute.get("metricAggregates"):
+                    bills = attribute.get("metricAggregates")
+                    return bills.get("billAmount")
+        _LOGGER.warning("Billing details failed: No response data")
+        return None
+
+    async def call_load_water_usage_api(self, start, end, account_number):
+        """Return (startTime, gallons) pairs, streamed from the timeseries response."""
+        api_url = USAGES_API_PREFIX + "timeseries"
+        params = {
+            **TIMESERIES_PARAMS,
+            "startTime": start,
+            "endTime": end,
+            "accountNumber": account_number,
+        }
+
+        _LOGGER.debug("Sending request to URL: %s", api_url)
+        response = await self._async_get(api_url, params)
+        async with response:
+            _LOGGER.debug("Response status: %s", response.status)
+            if response.status != 200:
+                _LOGGER.error("Timeseries request failed with status %s", response.status)
+                return None
+            # Only the two fields we import are kept from each record, so the
+            # full response tree is never built.
+            records = []
+            try:
+                async for record in ijson.items_async(response.content, "timeseries.item", use_float=True):
+                    water_use_actual = record.get("waterUseActual") or {}
+                    records.append((record.get("startTime"), water_use_actual.get("gallons")))
+            except ijson.JSONError as e:
+                _LOGGER.error("Failed to decode JSON from response: %s", e)
+                return None
+            return records
+
+    async def make_api_request(self, url, data, extract_json=True):
+        _LOGGER.debug("Sending request to URL: %s", url)
+
+        async with self._session.post(url, headers=API_HEADERS, json=data) as response:
+            _LOGGER.debug("Response status: %s", response.status)
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Response data: %s", await response.text())
+            if url.endswith("login"):
+                _LOGGER.debug("This is a login, trying notes API")
+                return await self.make_get_api_request(DEFAULT_API_PREFIX+ "notes", {}, False, reauth=False)
+            else: 
+                try:
+                    response_json = await response.json(loads=json_loads)
+                    if response_json:
+                        if extract_json:
+                            return self.extract_json_from_response(response_json, 'd')
+                        else:
+                            return response_json.get('d', {})
+                    return None
+                except (aiohttp.ContentTypeError, ValueError) as e:
+                    _LOGGER.error("Failed to decode JSON from response: %s", e)
+                    return None
+
+    async def _async_get(self, url, params, reauth=True):
+        """Send a GET request, logging in again once if the session was rejected."""
+        response = await self._session.get(url, headers=API_HEADERS, params=params)
+        if reauth and response.status in AUTH_FAILED_STATUSES:
+            response.release()
+            _LOGGER.debug("Session rejected with status %s, logging in again", response.status)
+            if not await self.login():
+                raise UpdateFailed("Failed to log in again after the session was rejected")
+            response = await self._session.get(url, headers=API_HEADERS, params=params)
+        return response
+
+    async def make_get_api_request(self, url, params, extract_json=True, reauth=True):
+        _LOGGER.debug("Sending request to URL: %s", url)
+
+        response = await self._async_get(url, params, reauth)
+        async with response:
+            _LOGGER.debug("Response status: %s", response.status)
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Response data: %s", await response.text())
+            if extract_json:
+                try:
+                    response_json = await response.json(loads=json_loads)
+                    return response_json
+                except (aiohttp.ContentTypeError, ValueError) as e:
+                    _LOGGER.error("Failed to decode JSON from response: %s", e)
+                    return None
+            else:
+                return {'response': response.status, 'data': await response.text()}
+                
+
+    def extract_json_from_response(self, response_json, key):
+        json_str = response_json.get(key, '{}')
+        try:
+            return json_loads(json_str)
+        except JSON_DECODE_EXCEPTIONS:
+            return {}